@@ -1,6 +1,7 @@
 
 import os
 from dotenv import load_dotenv
+from finalize import COLLISION_POLICIES
 
 load_dotenv()
 
@@ -12,6 +13,46 @@ def get_save_dir() -> str:
     os.makedirs(path, exist_ok=True)
     return path
 
+def get_collision_policy() -> str:
+    policy = os.getenv("COLLISION_POLICY", "suffix").strip().lower() or "suffix"
+    if policy not in COLLISION_POLICIES:
+        raise ValueError(f"COLLISION_POLICY must be one of {', '.join(COLLISION_POLICIES)} (got '{policy}').")
+    return policy
+
+def get_cover_max_dim() -> int:
+    return int(os.getenv("COVER_MAX_DIM", "1000"))
+
+def get_cover_max_bytes() -> int:
+    return int(os.getenv("COVER_MAX_KB", "500")) * 1024
+
+def get_service_settings() -> dict:
+    return {
+        "host": os.getenv("SERVICE_HOST", "127.0.0.1"),
+        "port": int(os.getenv("SERVICE_PORT", "8765")),
+        "workers": max(1, int(os.getenv("SERVICE_WORKERS", "2"))),
+        "db_path": os.path.expanduser(os.getenv("SERVICE_DB", os.path.join(os.getcwd(), "jobs.db"))),
+        # Kept apart from tmp/, which main.py wipes on exit
+        "tmp_dir": os.path.expanduser(os.getenv("SERVICE_TMP", os.path.join(os.getcwd(), "service_tmp"))),
+    }
+
+def get_scheduler_settings(concurrency: int = 1) -> dict:
+    """concurrency is how many jobs can actually run at once: 1 for the CLI,
+    SERVICE_WORKERS for the service. Default thread counts split the cores across it.
+    """
+    cpus = os.cpu_count() or 1
+    cpu_workers = max(1, int(os.getenv("CPU_WORKERS", str(max(1, cpus - 1)))))
+    cpu_workers = min(cpu_workers, max(1, concurrency))
+    per_worker = str(max(1, cpus // cpu_workers))
+    return {
+        "cpu_workers": cpu_workers,
+        "ffmpeg_threads": max(1, int(os.getenv("FFMPEG_THREADS", per_worker))),
+        "native_threads": max(1, int(os.getenv("NATIVE_THREADS", per_worker))),
+        "download_slots": max(1, int(os.getenv("DOWNLOAD_SLOTS", "2"))),
+        "tmp_min_free_mb": int(os.getenv("TMP_MIN_FREE_MB", "1024")),
+        "tmp_max_mb": int(os.getenv("TMP_MAX_MB", "4096")),
+        "tmp_wait_timeout": float(os.getenv("TMP_WAIT_TIMEOUT", "600")),
+    }
+
 def project_tmp_dir() -> str:
     tmp = os.path.join(os.getcwd(), "tmp")
     os.makedirs(tmp, exist_ok=True)
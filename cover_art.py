@@ -1,5 +1,6 @@
 import os
 import subprocess
+from scheduler import get_scheduler
 
 def download_temp_video(video_url: str, tmp_dir: str) -> str:
     """Download the YouTube video as a temp MP4 for ffmpeg frame extraction."""
@@ -24,6 +25,7 @@ def extract_frame_from_file(video_path: str, timestamp_sec: float, out_path: str
         "-ss", str(timestamp_sec),
         "-i", video_path,
         "-frames:v", "1",
+        "-threads", str(get_scheduler().ffmpeg_threads),
         out_path
     ]
     subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
@@ -32,7 +34,10 @@ def extract_frame_from_file(video_path: str, timestamp_sec: float, out_path: str
 def extract_frame_to_jpeg(video_url: str, timestamp_sec: float, out_path: str, tmp_dir: str = "tmp") -> str:
     """Download video then extract frame (works with YouTube)."""
     local_video = download_temp_video(video_url, tmp_dir)
-    return extract_frame_from_file(local_video, timestamp_sec, out_path)
+    try:
+        return extract_frame_from_file(local_video, timestamp_sec, out_path)
+    finally:
+        os.remove(local_video)  # Full video can be large; only the frame is needed
 
 import cv2
 import yt_dlp
@@ -1,18 +1,78 @@
 
 import os
 import subprocess
-from typing import Tuple
+from typing import Callable, Dict, Optional, Tuple
 import yt_dlp
+from yt_dlp.postprocessor import FFmpegPostProcessor
+from scheduler import get_scheduler
 
-def download_best_audio(url: str, out_dir: str) -> Tuple[str, str]:
+class TrimTagMP3PP(FFmpegPostProcessor):
+    """Cut, encode to MP3, and attach ID3 tags/cover in a single ffmpeg pass.
+    Replaces FFmpegExtractAudio when trim times and tags are known before download.
+    """
+
+    def __init__(self, downloader=None, start: Optional[float] = None, end: Optional[float] = None,
+                 tags: Optional[Dict[str, str]] = None, cover_path: Optional[str] = None,
+                 bitrate: str = '320k'):
+        FFmpegPostProcessor.__init__(self, downloader)
+        self.start, self.end = start, end
+        self.tags = {k: v for k, v in (tags or {}).items() if v}
+        self.cover_path = cover_path
+        self.bitrate = bitrate
+
+    def run(self, info):
+        path = info['filepath']
+        new_path = os.path.splitext(path)[0] + '.mp3'
+        temp_path = new_path + '.temp.mp3' if new_path == path else new_path
+
+        in_opts = []
+        if self.start:
+            in_opts += ['-ss', str(self.start)]
+        if self.end is not None:
+            in_opts += ['-t', str(self.end - (self.start or 0))]
+        inputs = [(path, in_opts)]
+        opts = ['-map', '0:a:0', '-c:a', 'libmp3lame', '-b:a', self.bitrate]
+        if self.cover_path:
+            inputs.append((self.cover_path, []))
+            opts += ['-map', '1:v:0', '-c:v', 'copy', '-disposition:v', 'attached_pic',
+                     '-metadata:s:v', 'title=Album cover', '-metadata:s:v', 'comment=Cover (front)']
+        for key, value in self.tags.items():
+            opts += ['-metadata', f'{key}={value}']
+        opts += ['-id3v2_version', '3']
+
+        self.to_screen(f'Trimming/tagging in one pass: {new_path}')
+        self.real_run_ffmpeg(inputs, [(temp_path, opts)])
+        if temp_path != new_path:
+            os.replace(temp_path, new_path)
+            to_delete = []
+        else:
+            to_delete = [path]
+        info['filepath'] = new_path
+        info['ext'] = 'mp3'
+        return to_delete, info
+
+def download_best_audio(url: str, out_dir: str,
+                        progress_hook: Optional[Callable[[dict], None]] = None,
+                        postprocessor_hook: Optional[Callable[[dict], None]] = None,
+                        start: Optional[float] = None, end: Optional[float] = None,
+                        tags: Optional[Dict[str, str]] = None,
+                        cover_path: Optional[str] = None) -> Tuple[str, str]:
     """Download best audio and convert to mp3 via yt_dlp/ffmpeg.
-    Returns (mp3_path, title).
+    Returns (mp3_path, title). progress_hook/postprocessor_hook receive yt_dlp
+    progress dicts.
+    If start/end, tags, or a JPEG cover_path are given, they are applied in the
+    same ffmpeg pass as the MP3 encode.
     """
+    if start is not None and start < 0:
+        raise ValueError("Start must not be negative.")
+    if end is not None and end <= (start or 0):
+        raise ValueError("End must be greater than start.")
+    one_pass = start is not None or end is not None or bool(tags) or bool(cover_path)
     os.makedirs(out_dir, exist_ok=True)
     ydl_opts = {
         'format': 'bestaudio/best',
         'outtmpl': os.path.join(out_dir, '%(title)s.%(ext)s'),
-        'postprocessors': [{
+        'postprocessors': [] if one_pass else [{
             'key': 'FFmpegExtractAudio',
             'preferredcodec': 'mp3',
             'preferredquality': '320',
@@ -20,8 +80,15 @@ def download_best_audio(url: str, out_dir: str) -> Tuple[str, str]:
         'noplaylist': True,
         'quiet': False,
         'nocheckcertificate': True,
+        'postprocessor_args': {'ffmpeg': ['-threads', str(get_scheduler().ffmpeg_threads)]},
     }
+    if progress_hook:
+        ydl_opts['progress_hooks'] = [progress_hook]
+    if postprocessor_hook:
+        ydl_opts['postprocessor_hooks'] = [postprocessor_hook]
     with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        if one_pass:
+            ydl.add_post_processor(TrimTagMP3PP(start=start, end=end, tags=tags, cover_path=cover_path))
         info = ydl.extract_info(url, download=True)
         title = info.get('title', 'audio')
         # After post-processing, the file should be {title}.mp3 in out_dir
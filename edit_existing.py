@@ -1,6 +1,7 @@
 import os
 from tkinter import Tk, filedialog
-from config import get_save_dir
+from config import get_save_dir, get_collision_policy
+from finalize import finalize_file
 from utils import safe_filename, confirm, safe_input
 from metadata import edit_metadata_cli, edit_metadata_gui, clear_all_metadata, set_cover_from_image
 
@@ -60,8 +61,11 @@ def maybe_rename(mp3_path):
     final_name = safe_filename(new_name)
     final_path = os.path.join(save_dir, final_name)
     if os.path.abspath(mp3_path) != os.path.abspath(final_path):
-        os.rename(mp3_path, final_path)
-        print(f"Renamed to: {final_path}")
+        renamed = finalize_file(mp3_path, final_path, get_collision_policy())
+        if renamed is None:
+            print(f"Skipped: '{final_name}' already exists.")
+        else:
+            print(f"Renamed to: {renamed}")
     else:
         print("Name unchanged.")
 
@@ -0,0 +1,134 @@
+import errno
+import os
+import shutil
+import tempfile
+from typing import Iterator, Optional
+
+COLLISION_POLICIES = ("skip", "overwrite", "suffix")
+COPY_BUFSIZE = 1024 * 1024
+FICLONE = 0x40049409  # Linux ioctl: reflink (share extents) on btrfs/xfs
+
+def same_filesystem(src: str, dst_dir: str) -> bool:
+    try:
+        return os.stat(src).st_dev == os.stat(dst_dir).st_dev
+    except OSError:
+        return False
+
+def _candidates(dst: str, policy: str) -> Iterator[str]:
+    yield dst
+    if policy != "suffix":
+        return
+    base, ext = os.path.splitext(dst)
+    n = 2
+    while True:
+        yield f"{base} ({n}){ext}"
+        n += 1
+
+def _fsync_dir(path: str) -> None:
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return  # Not supported on this platform (e.g. Windows)
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def _try_reflink(src_f, dst_f) -> bool:
+    try:
+        import fcntl
+        fcntl.ioctl(dst_f.fileno(), FICLONE, src_f.fileno())
+        return True
+    except (ImportError, OSError):
+        return False
+
+def _commit(tmp_path: str, dst: str, policy: str) -> bool:
+    """Atomically publish tmp_path at dst. Returns False if dst already exists
+    and policy forbids clobbering it.
+    """
+    if policy == "overwrite":
+        os.replace(tmp_path, dst)
+        return True
+    try:
+        # link() never clobbers, so the existence check and publish are one step
+        os.link(tmp_path, dst)
+    except FileExistsError:
+        return False
+    except OSError as e:
+        if e.errno not in (errno.EPERM, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EXDEV, errno.EMLINK):
+            raise
+        # Filesystem without hard links (exFAT, some SMB shares): best-effort check
+        if os.path.lexists(dst):
+            return False
+        os.replace(tmp_path, dst)
+        return True
+    os.unlink(tmp_path)
+    return True
+
+def _stage_copy(src: str, dst_dir: str) -> str:
+    """Copy src to a hidden temp file in dst_dir, fsynced, and return its path."""
+    fd, tmp_path = tempfile.mkstemp(dir=dst_dir, prefix=".", suffix=".part")
+    try:
+        with open(src, "rb") as src_f, os.fdopen(fd, "wb") as dst_f:
+            if not _try_reflink(src_f, dst_f):
+                shutil.copyfileobj(src_f, dst_f, COPY_BUFSIZE)
+            dst_f.flush()
+            os.fsync(dst_f.fileno())
+        shutil.copystat(src, tmp_path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    return tmp_path
+
+def finalize_file(src: str, dst: str, policy: str = "suffix") -> Optional[str]:
+    """Move src to dst without leaving partially written files behind.
+
+    On the same filesystem the file is renamed (or hard-linked) in place; across
+    filesystems it is streamed to a hidden temp name, fsynced, and renamed.
+    Collisions are resolved by policy: 'skip', 'overwrite', or 'suffix'.
+    Returns the final path, or None if skipped.
+    """
+    if policy not in COLLISION_POLICIES:
+        raise ValueError(f"Unknown collision policy: {policy!r}")
+    if os.path.abspath(src) == os.path.abspath(dst):
+        return dst
+    dst_dir = os.path.dirname(os.path.abspath(dst))
+    os.makedirs(dst_dir, exist_ok=True)
+
+    if policy == "skip" and os.path.lexists(dst) and not os.path.samefile(src, dst):
+        return None  # Don't stage a copy over the network just to throw it away
+    if same_filesystem(src, dst_dir):
+        staged = src
+    else:
+        staged = _stage_copy(src, dst_dir)
+
+    try:
+        for candidate in _candidates(dst, policy):
+            if os.path.exists(candidate) and os.path.samefile(src, candidate):
+                # Case-only rename on a case-insensitive filesystem (macOS/iCloud)
+                os.rename(src, candidate)
+                return candidate
+            try:
+                committed = _commit(staged, candidate, policy)
+            except OSError as e:
+                if e.errno != errno.EXDEV or staged != src:
+                    raise
+                # Same device but different mounts (bind mounts): fall back to copying
+                staged = _stage_copy(src, dst_dir)
+                committed = _commit(staged, candidate, policy)
+            if committed:
+                _fsync_dir(dst_dir)
+                if staged != src:
+                    os.unlink(src)
+                return candidate
+            if policy == "skip":
+                return None
+    finally:
+        if staged != src and os.path.exists(staged):
+            os.unlink(staged)
+    return None
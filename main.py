@@ -1,14 +1,16 @@
 
 import os
 import shutil
+from typing import Optional
 from tkinter import Tk, filedialog
-from config import get_save_dir, project_tmp_dir
+from config import get_save_dir, get_collision_policy, project_tmp_dir
 from utils import safe_filename, input_float, confirm, safe_input
 from search import is_url, search_youtube, select_result
 from downloader import download_best_audio
 from trim import trim_manual, trim_interactive
 from metadata import edit_metadata_cli, edit_metadata_gui, set_cover_from_image, clear_all_metadata
 from cover_art import extract_frame_to_jpeg
+from finalize import finalize_file
 
 def choose_search() -> str:
     q = safe_input("Enter YouTube URL or keywords: ").strip()
@@ -127,18 +129,16 @@ def maybe_cover(mp3_path: str, url: str) -> None:
             print("Interactive frame picking failed:", e)
 
 
-def final_rename_and_save(mp3_path: str) -> str:
+def final_rename_and_save(mp3_path: str) -> Optional[str]:
     out_dir = get_save_dir()
     default_name = os.path.basename(mp3_path)
     print("Example of naming convention: John Mayer - Human Nature (Michael Jackson Memorial 2009).mp3\n")
     new_name = safe_input(f"Rename file (blank to keep '{default_name}'): ").strip()
     final_name = safe_filename(new_name) + '.mp3' if new_name else default_name
-    final_path = os.path.join(out_dir, final_name)
-    os.makedirs(out_dir, exist_ok=True)
-    # If same path, just keep it; else move/copy
-    if os.path.abspath(mp3_path) != os.path.abspath(final_path):
-        import shutil
-        shutil.copy2(mp3_path, final_path)
+    final_path = finalize_file(mp3_path, os.path.join(out_dir, final_name), get_collision_policy())
+    if final_path is None:
+        print(f"Skipped: '{final_name}' already exists in {out_dir}")
+        return None
     print("Saved:", final_path)
     return final_path
 
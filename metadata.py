@@ -1,12 +1,16 @@
 
-from typing import Optional
+from collections import OrderedDict
+from typing import Optional, Tuple
 from mutagen.easyid3 import EasyID3
 from mutagen.id3 import ID3, APIC, error
 from PIL import Image
 import io
+import hashlib
+import threading
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 from utils import safe_input
+from config import get_cover_max_dim, get_cover_max_bytes
 
 def clear_all_metadata(mp3_path: str) -> None:
     try:
@@ -26,11 +30,52 @@ def set_basic_metadata(mp3_path: str, title: Optional[str], artist: Optional[str
     if album is not None: tags['album'] = album
     tags.save(mp3_path)
 
+COVER_CACHE_SIZE = 32
+_cover_cache: "OrderedDict[Tuple[str, int, int], bytes]" = OrderedDict()
+_cover_cache_lock = threading.Lock()
+
+def prepare_cover(image_path: str, max_dim: Optional[int] = None, max_bytes: Optional[int] = None) -> bytes:
+    """Return JPEG bytes for image_path that fit within max_dim pixels and max_bytes.
+    Results are memoized by source hash so an album shares one encode.
+    """
+    max_dim = max_dim or get_cover_max_dim()
+    max_bytes = max_bytes or get_cover_max_bytes()
+    with open(image_path, 'rb') as f:
+        raw = f.read()
+    key = (hashlib.sha256(raw).hexdigest(), max_dim, max_bytes)
+    with _cover_cache_lock:
+        if key in _cover_cache:
+            _cover_cache.move_to_end(key)
+            return _cover_cache[key]
+    jpeg = _encode_cover(raw, max_dim, max_bytes)
+    with _cover_cache_lock:
+        _cover_cache[key] = jpeg
+        if len(_cover_cache) > COVER_CACHE_SIZE:
+            _cover_cache.popitem(last=False)  # Drop least recently used
+    return jpeg
+
+def _encode_cover(raw: bytes, max_dim: int, max_bytes: int) -> bytes:
+    img = Image.open(io.BytesIO(raw))
+    if (img.format == 'JPEG' and img.mode in ('RGB', 'L')
+            and max(img.size) <= max_dim and len(raw) <= max_bytes):
+        return raw  # Already small enough; embed as-is
+    if img.format == 'JPEG':
+        # Let libjpeg decode at a reduced scale instead of full resolution
+        img.draft('RGB', (max_dim, max_dim))
+    img = img.convert('RGB')
+    img.thumbnail((max_dim, max_dim), Image.LANCZOS)
+    while True:
+        for quality in (90, 80, 70):
+            bio = io.BytesIO()
+            img.save(bio, format='JPEG', quality=quality, optimize=True)
+            if bio.tell() <= max_bytes:
+                return bio.getvalue()
+        if max(img.size) <= 200:
+            return bio.getvalue()
+        img = img.resize((int(img.width * 0.75), int(img.height * 0.75)), Image.LANCZOS)
+
 def set_cover_from_image(mp3_path: str, image_path: str) -> None:
-    img = Image.open(image_path).convert('RGB')
-    bio = io.BytesIO()
-    img.save(bio, format='JPEG', quality=90)
-    _set_apic(mp3_path, bio.getvalue())
+    _set_apic(mp3_path, prepare_cover(image_path))
 
 def _set_apic(mp3_path: str, jpeg_bytes: bytes) -> None:
     try:
@@ -0,0 +1,222 @@
+import os
+import shutil
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+from config import get_scheduler_settings
+
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS",
+                   "NUMEXPR_NUM_THREADS", "VECLIB_MAXIMUM_THREADS", "NUMBA_NUM_THREADS")
+
+def limit_native_threads(n: int) -> None:
+    """Cap BLAS/OpenMP, numba, and OpenCV thread pools at n threads.
+
+    Env vars cover libraries not yet imported (and child processes); already
+    loaded pools are capped directly. Thread counts the user already exported
+    are kept unless NATIVE_THREADS is set explicitly.
+    """
+    explicit = bool(os.getenv("NATIVE_THREADS"))
+    user_set = any(var in os.environ for var in THREAD_ENV_VARS)
+    for var in THREAD_ENV_VARS:
+        if explicit:
+            os.environ[var] = str(n)
+        else:
+            os.environ.setdefault(var, str(n))
+    if user_set and not explicit:
+        return  # Loaded libraries already sized their pools from the user's settings
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(n)
+    except ImportError:
+        pass
+    if "numba" in sys.modules:
+        try:
+            sys.modules["numba"].set_num_threads(min(n, sys.modules["numba"].config.NUMBA_NUM_THREADS))
+        except (AttributeError, ValueError):
+            pass
+    if "cv2" in sys.modules:
+        sys.modules["cv2"].setNumThreads(n)
+
+def _dir_size(path: str, exclude: Optional[str] = None) -> int:
+    exclude = os.path.abspath(exclude) if exclude else None
+    total = 0
+    for root, dirs, files in os.walk(path):
+        if exclude:
+            dirs[:] = [d for d in dirs if os.path.abspath(os.path.join(root, d)) != exclude]
+        for f in files:
+            try:
+                total += os.path.getsize(os.path.join(root, f))
+            except OSError:
+                pass
+    return total
+
+class _Slots:
+    """Counting semaphore that also tracks active/waiting holders and busy time."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._sem = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self.active = 0
+        self.waiting = 0
+        self._busy_seconds = 0.0
+        self._last = time.time()
+
+    def _tick(self) -> None:
+        # Integrate active holders over time; call with _lock held
+        now = time.time()
+        self._busy_seconds += self.active * (now - self._last)
+        self._last = now
+
+    def acquire(self) -> None:
+        with self._lock:
+            self.waiting += 1
+        self._sem.acquire()
+        with self._lock:
+            self._tick()
+            self.waiting -= 1
+            self.active += 1
+
+    def release(self) -> None:
+        with self._lock:
+            self._tick()
+            self.active -= 1
+        self._sem.release()
+
+    def busy_seconds(self) -> float:
+        with self._lock:
+            self._tick()
+            return self._busy_seconds
+
+    def stats(self) -> Dict:
+        return {"size": self.size, "active": self.active, "waiting": self.waiting}
+
+class Scheduler:
+    """Coordinates CPU-heavy stages, downloads, and tmp/ usage across a batch.
+
+    - download_slot() / encode_slot(): cap concurrent network downloads and
+      CPU-bound encodes (ffmpeg, cover resizing) separately. Encode slots are
+      sized so cpu_workers x ffmpeg_threads stays within the host's cores.
+    - wait_for_tmp_space(): blocks (up to a timeout) while the work dir is over
+      budget or the disk is low.
+    """
+
+    def __init__(self, settings: Optional[Dict] = None):
+        self.settings = settings or get_scheduler_settings()
+        self.cpu_workers = self.settings["cpu_workers"]
+        self.ffmpeg_threads = self.settings["ffmpeg_threads"]
+        self.native_threads = self.settings["native_threads"]
+        self.downloads = _Slots(self.settings["download_slots"])
+        self.encodes = _Slots(self.cpu_workers)
+        self._lock = threading.Lock()
+        self._started = time.time()
+        self._tmp_waits = 0
+
+    def cap_native_threads(self) -> None:
+        """Split NumPy/numba/OpenCV pools across concurrent jobs. Only worth doing
+        when jobs actually run in parallel (the service), not for the one-at-a-time CLI.
+        """
+        limit_native_threads(self.native_threads)
+
+    @contextmanager
+    def download_slot(self):
+        self.downloads.acquire()
+        try:
+            yield
+        finally:
+            self.downloads.release()
+
+    @contextmanager
+    def encode_slot(self):
+        self.encodes.acquire()
+        try:
+            yield
+        finally:
+            self.encodes.release()
+
+    @contextmanager
+    def download_then_encode(self):
+        """Hold a download slot until yt-dlp starts post-processing, then swap it
+        for an encode slot. Yields a yt-dlp postprocessor hook.
+        """
+        state = {"download": True, "encode": False}
+        self.downloads.acquire()
+
+        def hook(d: dict) -> None:
+            if d.get("status") == "started" and not state["encode"]:
+                self.downloads.release()
+                state["download"] = False
+                self.encodes.acquire()
+                state["encode"] = True
+
+        try:
+            yield hook
+        finally:
+            if state["download"]:
+                self.downloads.release()
+            if state["encode"]:
+                self.encodes.release()
+
+    def wait_for_tmp_space(self, tmp_root: str, exclude: Optional[str] = None,
+                           timeout: Optional[float] = None, poll: float = 1.0) -> None:
+        """Block until tmp_root is under TMP_MAX_MB and the disk has TMP_MIN_FREE_MB free.
+
+        exclude (the caller's own work dir) is left out of the budget. Raises
+        TimeoutError after timeout seconds (default TMP_WAIT_TIMEOUT).
+        """
+        min_free = self.settings["tmp_min_free_mb"] * 1024 * 1024
+        max_used = self.settings["tmp_max_mb"] * 1024 * 1024
+        timeout = self.settings["tmp_wait_timeout"] if timeout is None else timeout
+        os.makedirs(tmp_root, exist_ok=True)
+        deadline = time.time() + timeout
+        waited = False
+        while True:
+            low_disk = shutil.disk_usage(tmp_root).free < min_free
+            over_budget = max_used > 0 and _dir_size(tmp_root, exclude) > max_used
+            if not (low_disk or over_budget):
+                return
+            if time.time() >= deadline:
+                reason = "free disk is below TMP_MIN_FREE_MB" if low_disk else "usage is above TMP_MAX_MB"
+                raise TimeoutError(f"Gave up after {timeout:g}s waiting for space in {tmp_root}: {reason}.")
+            if not waited:
+                waited = True
+                with self._lock:
+                    self._tmp_waits += 1
+            time.sleep(poll)
+
+    def stats(self, tmp_root: Optional[str] = None) -> Dict:
+        elapsed = max(time.time() - self._started, 1e-9)
+        with self._lock:
+            tmp_waits = self._tmp_waits
+        return {
+            "cpu_workers": self.cpu_workers,
+            "queue_depth": self.downloads.waiting + self.encodes.waiting,
+            # Share of encode-slot capacity in use since startup
+            "utilization": round(self.encodes.busy_seconds() / (elapsed * self.cpu_workers), 3),
+            "downloads": self.downloads.stats(),
+            "encodes": self.encodes.stats(),
+            "ffmpeg_threads": self.ffmpeg_threads,
+            "native_threads": self.native_threads,
+            "tmp_mb": round(_dir_size(tmp_root) / (1024 * 1024), 1) if tmp_root else None,
+            "tmp_waits": tmp_waits,
+        }
+
+_scheduler: Optional[Scheduler] = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler() -> Scheduler:
+    """Process-wide scheduler; defaults to single-job (CLI) settings."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = Scheduler()
+        return _scheduler
+
+def configure_scheduler(settings: Dict) -> Scheduler:
+    """Replace the process-wide scheduler, e.g. with the service's settings at startup."""
+    global _scheduler
+    with _scheduler_lock:
+        _scheduler = Scheduler(settings)
+        return _scheduler
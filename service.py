@@ -0,0 +1,376 @@
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlparse, parse_qs
+from config import get_save_dir, get_collision_policy, get_service_settings, get_scheduler_settings
+from utils import safe_filename
+from search import is_url, search_youtube
+from downloader import download_best_audio
+from metadata import prepare_cover
+from cover_art import extract_frame_to_jpeg
+from finalize import finalize_file
+from scheduler import configure_scheduler, get_scheduler
+
+Reporter = Callable[[str, float], None]
+HEARTBEAT_SECONDS = 15
+# yt-dlp reports progress per downloaded block; only persist meaningful changes
+PROGRESS_MIN_STEP = 0.01
+PROGRESS_MIN_INTERVAL = 0.5
+
+# ---------------- Pipeline ----------------
+
+def run_pipeline(spec: Dict, job_dir: str, report: Reporter) -> Dict:
+    """Headless search → download → trim → tag → save for one job spec.
+
+    spec keys: 'url' or 'query'; optional 'trim' {start, end}, 'tags'
+    {title, artist, album}, 'cover' {timestamp} or {image}, and 'filename'.
+    """
+    url = spec.get("url") or spec.get("query", "")
+    if not url:
+        raise ValueError("Job needs a 'url' or 'query'.")
+    if not is_url(url):
+        report("search", 0.0)
+        results = search_youtube(url, limit=1)
+        if not results:
+            raise ValueError(f"No results for '{url}'.")
+        url = results[0]["link"]
+
+    sched = get_scheduler()
+    # Check the budget once, before this job writes its first file
+    sched.wait_for_tmp_space(os.path.dirname(job_dir), exclude=job_dir)
+
+    # Resolve the cover first so trim, encode, tags, and cover happen in one ffmpeg pass
+    cover = spec.get("cover") or {}
+    cover_path = None
+    if cover.get("image") or cover.get("timestamp") is not None:
+        report("cover", 0.0)
+        source = cover.get("image")
+        if not source:
+            source = os.path.join(job_dir, "frame.jpg")
+            with sched.download_slot():
+                extract_frame_to_jpeg(url, float(cover["timestamp"]), source, tmp_dir=job_dir)
+        cover_path = os.path.join(job_dir, "cover.jpg")
+        with sched.encode_slot():
+            jpeg = prepare_cover(source)
+        with open(cover_path, "wb") as f:
+            f.write(jpeg)
+
+    def on_download(d: dict) -> None:
+        total = d.get("total_bytes") or d.get("total_bytes_estimate")
+        if d.get("status") == "downloading" and total:
+            report("download", 0.1 + 0.7 * d.get("downloaded_bytes", 0) / total)
+
+    trim = spec.get("trim") or {}
+    start = float(trim["start"]) if trim.get("start") is not None else None
+    end = float(trim["end"]) if trim.get("end") is not None else None
+    tags = {k: v for k, v in (spec.get("tags") or {}).items() if k in ("title", "artist", "album") and v}
+    report("download", 0.1)
+    with sched.download_then_encode() as on_postprocess:
+        mp3_path, title = download_best_audio(
+            url, job_dir, progress_hook=on_download, postprocessor_hook=on_postprocess,
+            start=start, end=end, tags=tags, cover_path=cover_path,
+        )
+
+    report("save", 0.95)
+    name = spec.get("filename")
+    final_name = safe_filename(name) + ".mp3" if name else os.path.basename(mp3_path)
+    policy = spec.get("collision_policy") or get_collision_policy()
+    final_path = finalize_file(mp3_path, os.path.join(get_save_dir(), final_name), policy)
+    return {"title": title, "url": url, "path": final_path, "skipped": final_path is None}
+
+# ---------------- Job queue ----------------
+
+class JobQueue:
+    """SQLite-backed job queue worked by a fixed pool of threads.
+
+    Jobs survive restarts: anything left 'running' is re-queued on startup.
+    """
+
+    def __init__(self, db_path: str, tmp_dir: str, workers: int = 2,
+                 pipeline: Callable[[Dict, str, Reporter], Dict] = run_pipeline):
+        self.pipeline = pipeline
+        self.workers = workers
+        self.tmp_dir = tmp_dir
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._closed = False
+        self._threads: List[threading.Thread] = []
+        with self._cond:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT, spec TEXT NOT NULL,"
+                " status TEXT NOT NULL, stage TEXT, progress REAL NOT NULL DEFAULT 0,"
+                " result TEXT, error TEXT, created REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            self._db.execute("UPDATE jobs SET status='queued', stage=NULL, progress=0 WHERE status='running'")
+            self._db.commit()
+
+    @property
+    def stopping(self) -> bool:
+        return self._stopping
+
+    def start(self) -> None:
+        for i in range(self.workers):
+            t = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self, timeout: float = 2.0) -> None:
+        """Stop claiming jobs and close the DB without waiting out in-flight work.
+
+        Workers are daemon threads; jobs still 'running' are re-queued on the
+        next start, so there is nothing to gain from waiting on a long download.
+        """
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        deadline = time.time() + timeout
+        for t in self._threads:
+            t.join(max(0.0, deadline - time.time()))
+        with self._cond:
+            self._closed = True
+            self._db.close()
+
+    def submit(self, spec: Dict) -> int:
+        now = time.time()
+        with self._cond:
+            cur = self._db.execute(
+                "INSERT INTO jobs (spec, status, created, updated) VALUES (?, 'queued', ?, ?)",
+                (json.dumps(spec), now, now),
+            )
+            self._db.commit()
+            self._cond.notify_all()
+            return cur.lastrowid
+
+    def get(self, job_id: int) -> Optional[Dict]:
+        with self._cond:
+            row = self._db.execute("SELECT * FROM jobs WHERE id=?", (job_id,)).fetchone()
+        return _row_to_dict(row) if row else None
+
+    def list(self, status: Optional[str] = None) -> List[Dict]:
+        with self._cond:
+            if status:
+                rows = self._db.execute("SELECT * FROM jobs WHERE status=? ORDER BY id", (status,)).fetchall()
+            else:
+                rows = self._db.execute("SELECT * FROM jobs ORDER BY id").fetchall()
+        return [_row_to_dict(r) for r in rows]
+
+    def wait_finished(self, ids: Optional[List[int]], seen: set, timeout: float,
+                      since: Optional[float] = None) -> List[Dict]:
+        """Block until a finished job not in seen appears (or timeout) and return them.
+        since limits results to jobs that finished at or after that time.
+        """
+        deadline = time.time() + timeout
+        with self._cond:
+            while True:
+                jobs = [j for j in self._finished(ids, since) if j["id"] not in seen]
+                remaining = deadline - time.time()
+                if jobs or remaining <= 0 or self._stopping:
+                    return jobs
+                self._cond.wait(remaining)
+
+    def _finished(self, ids: Optional[List[int]], since: Optional[float] = None) -> List[Dict]:
+        sql = "SELECT * FROM jobs WHERE status IN ('done', 'failed')"
+        params: list = []
+        if ids:
+            sql += f" AND id IN ({','.join('?' * len(ids))})"
+            params += ids
+        if since is not None:
+            sql += " AND updated >= ?"
+            params.append(since)
+        return [_row_to_dict(r) for r in self._db.execute(sql + " ORDER BY updated", params).fetchall()]
+
+    def _update(self, job_id: int, **fields) -> None:
+        fields["updated"] = time.time()
+        cols = ", ".join(f"{k}=?" for k in fields)
+        with self._cond:
+            if self._closed:
+                return  # Shutting down; the job is re-queued on the next start
+            self._db.execute(f"UPDATE jobs SET {cols} WHERE id=?", (*fields.values(), job_id))
+            self._db.commit()
+            if "status" in fields:
+                # Only status changes matter to waiters; progress is polled
+                self._cond.notify_all()
+
+    def _claim(self) -> Optional[sqlite3.Row]:
+        with self._cond:
+            while not self._stopping:
+                row = self._db.execute("SELECT * FROM jobs WHERE status='queued' ORDER BY id LIMIT 1").fetchone()
+                if row:
+                    self._db.execute("UPDATE jobs SET status='running', updated=? WHERE id=?", (time.time(), row["id"]))
+                    self._db.commit()
+                    self._cond.notify_all()
+                    return row
+                self._cond.wait()
+        return None
+
+    def _work(self) -> None:
+        while True:
+            row = self._claim()
+            if row is None:
+                return
+            job_id = row["id"]
+            job_dir = os.path.join(self.tmp_dir, str(job_id))
+            os.makedirs(job_dir, exist_ok=True)
+
+            last = {"stage": None, "progress": 0.0, "time": 0.0}
+
+            def report(stage: str, progress: float) -> None:
+                now = time.time()
+                if (stage == last["stage"]
+                        and abs(progress - last["progress"]) < PROGRESS_MIN_STEP
+                        and now - last["time"] < PROGRESS_MIN_INTERVAL):
+                    return
+                last.update(stage=stage, progress=progress, time=now)
+                self._update(job_id, stage=stage, progress=round(progress, 3))
+
+            try:
+                result = self.pipeline(json.loads(row["spec"]), job_dir, report)
+                self._update(job_id, status="done", stage=None, progress=1.0, result=json.dumps(result))
+            except Exception as e:
+                traceback.print_exc()
+                self._update(job_id, status="failed", error=str(e) or e.__class__.__name__)
+            finally:
+                shutil.rmtree(job_dir, ignore_errors=True)
+
+def _row_to_dict(row: sqlite3.Row) -> Dict:
+    return {
+        "id": row["id"],
+        "status": row["status"],
+        "stage": row["stage"],
+        "progress": row["progress"],
+        "spec": json.loads(row["spec"]),
+        "result": json.loads(row["result"]) if row["result"] else None,
+        "error": row["error"],
+        "created": row["created"],
+        "updated": row["updated"],
+    }
+
+# ---------------- HTTP ----------------
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """JSON endpoints:
+      POST /jobs              submit one spec, or {"jobs": [...]} for a batch
+      GET  /jobs[?status=]    list jobs
+      GET  /jobs/<id>         job status and progress
+      GET  /events[?ids=1,2]  NDJSON stream of results as jobs finish (blank lines are heartbeats)
+      GET  /stats             scheduler queue depth and utilization
+    """
+    queue: JobQueue  # set by make_server
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        if urlparse(self.path).path.rstrip("/") != "/jobs":
+            return self._send_json(404, {"error": "Not found"})
+        try:
+            length = int(self.headers.get("Content-Length", ""))
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.close_connection = True
+            return self._send_json(411, {"error": "A valid Content-Length is required."})
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except (ValueError, json.JSONDecodeError):
+            return self._send_json(400, {"error": "Body must be JSON."})
+        specs = body.get("jobs") if isinstance(body, dict) and "jobs" in body else [body]
+        if not isinstance(specs, list) or not specs:
+            return self._send_json(400, {"error": "'jobs' must be a non-empty list."})
+        if not all(isinstance(s, dict) and (s.get("url") or s.get("query")) for s in specs):
+            return self._send_json(400, {"error": "Each job needs a 'url' or 'query'."})
+        ids = [self.queue.submit(s) for s in specs]
+        self._send_json(202, {"ids": ids})
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        parts = [p for p in parsed.path.split("/") if p]
+        query = parse_qs(parsed.query)
+        if parts == ["jobs"]:
+            return self._send_json(200, {"jobs": self.queue.list(query.get("status", [None])[0])})
+        if len(parts) == 2 and parts[0] == "jobs" and parts[1].isdigit():
+            job = self.queue.get(int(parts[1]))
+            return self._send_json(200, job) if job else self._send_json(404, {"error": "No such job."})
+        if parts == ["stats"]:
+            stats = get_scheduler().stats(self.queue.tmp_dir)
+            stats["jobs_queued"] = len(self.queue.list("queued"))
+            return self._send_json(200, stats)
+        if parts == ["events"]:
+            raw_ids = query.get("ids", [""])[0]
+            try:
+                # Dedupe, or a repeated id would keep the stream open forever
+                ids = sorted({int(i) for i in raw_ids.split(",") if i}) or None
+            except ValueError:
+                return self._send_json(400, {"error": "ids must be comma-separated integers."})
+            if ids and not all(self.queue.get(i) for i in ids):
+                return self._send_json(404, {"error": "No such job."})
+            return self._stream_events(ids)
+        self._send_json(404, {"error": "Not found"})
+
+    def _stream_events(self, ids: Optional[List[int]]) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        # Without ids, only report jobs that finish from now on
+        since = None if ids else time.time()
+        seen = set()
+        try:
+            while not ids or len(seen) < len(ids):
+                jobs = self.queue.wait_finished(ids, seen, timeout=HEARTBEAT_SECONDS, since=since)
+                for job in jobs:
+                    seen.add(job["id"])
+                    self._write_chunk((json.dumps(job) + "\n").encode())
+                if self.queue.stopping:
+                    break
+                if not jobs:
+                    # Heartbeat; a failed write is how a dropped client is noticed
+                    self._write_chunk(b"\n")
+            self._write_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        self.close_connection = True
+
+    def _write_chunk(self, data: bytes) -> None:
+        self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, code: int, payload) -> None:
+        data = json.dumps(payload).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+def make_server(queue: JobQueue, host: str, port: int) -> ThreadingHTTPServer:
+    handler = type("BoundServiceHandler", (ServiceHandler,), {"queue": queue})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+def main():
+    settings = get_service_settings()
+    get_save_dir()  # Fail fast if SAVE_DIR is missing
+    configure_scheduler(get_scheduler_settings(concurrency=settings["workers"])).cap_native_threads()
+    queue = JobQueue(settings["db_path"], settings["tmp_dir"], workers=settings["workers"])
+    queue.start()
+    server = make_server(queue, settings["host"], settings["port"])
+    print(f"Serving on http://{settings['host']}:{settings['port']} with {settings['workers']} worker(s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nGoodbye!")
+    finally:
+        server.server_close()
+        queue.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+import urllib.error
+import urllib.request
+from unittest import mock
+from PIL import Image
+import service
+from config import get_scheduler_settings
+from scheduler import configure_scheduler
+
+def stub_pipeline(spec, job_dir, report):
+    """Replaces the whole pipeline so the HTTP/queue tests stay fast and offline."""
+    report("download", 0.5)
+    time.sleep(0.05)
+    if spec.get("fail"):
+        raise RuntimeError("stub failure")
+    return {"title": "stub", "url": spec["url"], "job_dir_existed": os.path.isdir(job_dir)}
+
+class ServiceTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.queue = service.JobQueue(
+            os.path.join(self.tmp.name, "jobs.db"), os.path.join(self.tmp.name, "work"),
+            workers=2, pipeline=stub_pipeline,
+        )
+        self.queue.start()
+        self.server = service.make_server(self.queue, "127.0.0.1", 0)
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.queue.stop()
+        self.tmp.cleanup()
+
+    def post(self, payload):
+        req = urllib.request.Request(f"{self.base}/jobs", data=json.dumps(payload).encode(), method="POST")
+        with urllib.request.urlopen(req) as resp:
+            return resp.status, json.load(resp)
+
+    def get(self, path):
+        with urllib.request.urlopen(f"{self.base}{path}") as resp:
+            return json.load(resp)
+
+    def test_batch_runs_and_streams_results(self):
+        status, body = self.post({"jobs": [{"url": "https://a"}, {"url": "https://b", "fail": True}]})
+        self.assertEqual(status, 202)
+        ok_id, failed_id = body["ids"]
+
+        with urllib.request.urlopen(f"{self.base}/events?ids={ok_id},{failed_id}", timeout=10) as resp:
+            events = [json.loads(line) for line in resp if line.strip()]
+        self.assertEqual(sorted(e["id"] for e in events), [ok_id, failed_id])
+
+        job = self.get(f"/jobs/{ok_id}")
+        self.assertEqual(job["status"], "done")
+        self.assertEqual(job["progress"], 1.0)
+        self.assertEqual(job["result"]["url"], "https://a")
+        self.assertTrue(job["result"]["job_dir_existed"])
+
+        failed = self.get(f"/jobs/{failed_id}")
+        self.assertEqual(failed["status"], "failed")
+        self.assertEqual(failed["error"], "stub failure")
+        self.assertIsNone(failed["result"])
+
+    def test_rejects_invalid_jobs(self):
+        for payload in ({"jobs": None}, {"jobs": 5}, {"jobs": []}, {"title": "no url"}):
+            with self.assertRaises(urllib.error.HTTPError) as ctx:
+                self.post(payload)
+            self.assertEqual(ctx.exception.code, 400)
+
+    def test_unknown_job_is_404(self):
+        with self.assertRaises(urllib.error.HTTPError) as ctx:
+            self.get("/jobs/999")
+        self.assertEqual(ctx.exception.code, 404)
+
+class PipelineTest(unittest.TestCase):
+    """Runs the real run_pipeline with only YouTube (search + download) and SAVE_DIR stubbed."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.save_dir = os.path.join(self.tmp.name, "save")
+        self.job_dir = os.path.join(self.tmp.name, "work", "1")
+        os.makedirs(self.save_dir)
+        os.makedirs(self.job_dir)
+        self.sched = configure_scheduler({**get_scheduler_settings(), "tmp_min_free_mb": 0})
+        self.downloads = []
+        patches = [
+            mock.patch.object(service, "search_youtube", side_effect=self.fake_search),
+            mock.patch.object(service, "download_best_audio", side_effect=self.fake_download),
+            mock.patch.object(service, "get_save_dir", return_value=self.save_dir),
+            mock.patch.object(service, "get_collision_policy", return_value="suffix"),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def tearDown(self):
+        configure_scheduler(get_scheduler_settings())
+        self.tmp.cleanup()
+
+    def fake_search(self, query, limit=8):
+        return [{"title": "Stub", "link": f"https://youtube.test/watch?v={query.replace(' ', '_')}"}]
+
+    def fake_download(self, url, out_dir, progress_hook=None, postprocessor_hook=None, **kwargs):
+        self.downloads.append(dict(url=url, out_dir=out_dir, **kwargs))
+        if kwargs.get("cover_path"):
+            # The cover must be resolved before download so ffmpeg can attach it in one pass
+            with Image.open(kwargs["cover_path"]) as img:
+                self.assertEqual(img.format, "JPEG")
+        progress_hook({"status": "downloading", "downloaded_bytes": 5, "total_bytes": 10})
+        postprocessor_hook({"status": "started"})
+        self.assertEqual(self.sched.encodes.active, 1)
+        self.assertEqual(self.sched.downloads.active, 0)
+        mp3_path = os.path.join(out_dir, "Stub.mp3")
+        with open(mp3_path, "wb") as f:
+            f.write(b"ID3 stub audio")
+        return mp3_path, "Stub"
+
+    def run_pipeline(self, spec):
+        stages = []
+        result = service.run_pipeline(spec, self.job_dir, lambda stage, p: stages.append(stage))
+        return result, stages
+
+    def test_query_trim_tags_and_cover_pass_through(self):
+        cover = os.path.join(self.tmp.name, "cover.png")
+        Image.new("RGB", (1600, 1600), (200, 40, 40)).save(cover)
+        result, stages = self.run_pipeline({
+            "query": "john mayer human nature",
+            "trim": {"start": "5", "end": "10.5"},
+            "tags": {"title": "Human Nature", "artist": "", "genre": "ignored"},
+            "cover": {"image": cover},
+            "filename": "John Mayer - Human Nature",
+        })
+
+        call = self.downloads[0]
+        self.assertEqual(call["url"], "https://youtube.test/watch?v=john_mayer_human_nature")
+        self.assertEqual(call["out_dir"], self.job_dir)
+        self.assertEqual((call["start"], call["end"]), (5.0, 10.5))
+        self.assertEqual(call["tags"], {"title": "Human Nature"})
+        self.assertEqual(stages[:3], ["search", "cover", "download"])
+
+        expected = os.path.join(self.save_dir, "John Mayer - Human Nature.mp3")
+        self.assertEqual(result["path"], expected)
+        self.assertFalse(result["skipped"])
+        self.assertTrue(os.path.isfile(expected))
+        self.assertEqual((self.sched.encodes.active, self.sched.downloads.active), (0, 0))
+
+    def test_collision_policies(self):
+        existing = os.path.join(self.save_dir, "Stub.mp3")
+        with open(existing, "wb") as f:
+            f.write(b"already here")
+
+        result, _ = self.run_pipeline({"url": "https://youtube.test/watch?v=a", "collision_policy": "skip"})
+        self.assertTrue(result["skipped"])
+        self.assertIsNone(result["path"])
+        with open(existing, "rb") as f:
+            self.assertEqual(f.read(), b"already here")
+
+        result, _ = self.run_pipeline({"url": "https://youtube.test/watch?v=a"})
+        self.assertFalse(result["skipped"])
+        self.assertEqual(result["path"], os.path.join(self.save_dir, "Stub (2).mp3"))
+        self.assertEqual(self.downloads[-1]["start"], None)
+        self.assertEqual(self.downloads[-1]["tags"], {})
+
+if __name__ == "__main__":
+    unittest.main()
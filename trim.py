@@ -5,6 +5,7 @@ import librosa
 import numpy as np
 import cv2
 from pydub import AudioSegment
+from scheduler import get_scheduler
 
 def format_time(seconds: float) -> str:
     minutes = int(seconds // 60)
@@ -23,7 +24,8 @@ def trim_manual(mp3_path: str, start: Optional[float], end: Optional[float]) ->
         raise ValueError("End must be greater than start.")
     trimmed = audio[ms_start:ms_end]
     out_path = append_suffix(mp3_path, "trim" )
-    trimmed.export(out_path, format="mp3", bitrate="320k")
+    ffmpeg_threads = str(get_scheduler().ffmpeg_threads)
+    trimmed.export(out_path, format="mp3", bitrate="320k", parameters=["-threads", ffmpeg_threads])
     return out_path
 
 def append_suffix(path: str, suffix: str) -> str: